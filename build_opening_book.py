@@ -0,0 +1,50 @@
+import argparse
+from connect4.opening_book import build_opening_book
+
+# The __main__ guard keeps spawned build processes from re-running the build
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the opening book of a policy.")
+    parser.add_argument(
+        "--policy",
+        default=None,
+        help="Participant folder under groups/ (default: the negamax solver)",
+    )
+    parser.add_argument(
+        "--plies", type=int, default=4, help="Opening moves covered by the book"
+    )
+    parser.add_argument(
+        "--time-ms",
+        type=float,
+        default=5000,
+        help="Solver time per position; positions it cannot prove are left out",
+    )
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=20000,
+        help="Search iterations per position with --policy",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Build processes (default: all CPUs)"
+    )
+    parser.add_argument(
+        "--output",
+        default="groups/Cuarta versión/opening_book.npy",
+        help="Book file; rerun with the same path to resume an interrupted build",
+    )
+    args = parser.parse_args()
+
+    if args.policy is None:
+        mount_kwargs = {"time_ms": args.time_ms}
+    else:
+        # Search every position from scratch, without an older book
+        mount_kwargs = {"T": args.iterations, "book": None}
+
+    size = build_opening_book(
+        args.output,
+        args.plies,
+        args.policy,
+        mount_kwargs=mount_kwargs,
+        workers=args.workers,
+    )
+    print("Positions in book:", size)
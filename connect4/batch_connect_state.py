@@ -0,0 +1,223 @@
+# Types
+from typing import Any
+
+# Libraries
+import numpy as np
+
+from connect4.connect_state import ConnectState
+
+# Same bitboard layout as ConnectState: ROWS + 1 bits per column, bit
+# ``col * (ROWS + 1) + h`` is the cell at height ``h`` of column ``col``.
+_ROWS = ConnectState.ROWS
+_COLS = ConnectState.COLS
+_H1 = _ROWS + 1
+
+_ONE = np.uint64(1)
+_SHIFTS = tuple(np.uint64(s) for s in (1, _H1, _H1 - 1, _H1 + 1))
+_COL_BASE = np.arange(_COLS, dtype=np.uint64) * np.uint64(_H1)
+
+_CELL_INDEX = np.array(
+    [[c * _H1 + (_ROWS - 1 - r) for c in range(_COLS)] for r in range(_ROWS)],
+    dtype=np.uint64,
+)
+
+
+def _has_four(bits: np.ndarray) -> np.ndarray:
+    """Element-wise four-in-a-row test over an array of bitboards."""
+    found = np.zeros(bits.shape, dtype=bool)
+    for shift in _SHIFTS:
+        pairs = bits & (bits >> shift)
+        found |= (pairs & (pairs >> (shift + shift))) != 0
+    return found
+
+
+class BatchConnectState:
+    """
+    ``N`` independent Connect Four games stored as arrays of bitboards.
+
+    Every method works on all boards at once and follows the same rules as
+    ``ConnectState``: a game is over when someone connects four or the top
+    row is full, and a full column cannot be played.
+    """
+
+    ROWS = _ROWS
+    COLS = _COLS
+
+    def __init__(self, n: int, boards: np.ndarray | None = None, player: Any = -1):
+        """
+        Parameters
+        ----------
+        n : int
+            Number of games.
+        boards : np.ndarray, optional
+            ``(n, ROWS, COLS)`` array with -1 (Red), 1 (Yellow) and 0 (empty).
+            Empty boards are used when omitted.
+        player : int or np.ndarray
+            Player to move, either shared by every board or one per board.
+        """
+        if boards is None:
+            self.red = np.zeros(n, dtype=np.uint64)
+            self.yellow = np.zeros(n, dtype=np.uint64)
+        else:
+            boards = np.asarray(boards).reshape(n, self.ROWS, self.COLS)
+            weights = _ONE << _CELL_INDEX
+            self.red = np.where(boards == -1, weights, 0).sum(
+                axis=(1, 2), dtype=np.uint64
+            )
+            self.yellow = np.where(boards == 1, weights, 0).sum(
+                axis=(1, 2), dtype=np.uint64
+            )
+        self.player = np.broadcast_to(np.asarray(player, dtype=np.int8), n).copy()
+        self.winner = np.where(
+            _has_four(self.red), -1, np.where(_has_four(self.yellow), 1, 0)
+        ).astype(np.int8)
+        filled = self.red | self.yellow
+        column_bits = (filled[:, None] >> _COL_BASE) & np.uint64((1 << _ROWS) - 1)
+        # Height of a column = position of its highest stone
+        self.heights = np.zeros((n, self.COLS), dtype=np.int8)
+        for h in range(self.ROWS):
+            occupied = ((column_bits >> np.uint64(h)) & _ONE) != 0
+            self.heights[occupied] = h + 1
+
+    @classmethod
+    def from_states(cls, states: list[ConnectState]) -> "BatchConnectState":
+        """Builds a batch holding a copy of each given state."""
+        batch = cls(len(states))
+        batch.red[:] = [s.red for s in states]
+        batch.yellow[:] = [s.yellow for s in states]
+        batch.player[:] = [s.player for s in states]
+        batch.winner[:] = [s.winner for s in states]
+        batch.heights[:] = [list(s.heights) for s in states]
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.player)
+
+    def copy(self) -> "BatchConnectState":
+        batch = BatchConnectState.__new__(BatchConnectState)
+        batch.red = self.red.copy()
+        batch.yellow = self.yellow.copy()
+        batch.player = self.player.copy()
+        batch.winner = self.winner.copy()
+        batch.heights = self.heights.copy()
+        return batch
+
+    @property
+    def board(self) -> np.ndarray:
+        """``(N, ROWS, COLS)`` int8 array with the same encoding as ``ConnectState.board``."""
+        red = (self.red[:, None, None] >> _CELL_INDEX) & _ONE
+        yellow = (self.yellow[:, None, None] >> _CELL_INDEX) & _ONE
+        return yellow.astype(np.int8) - red.astype(np.int8)
+
+    def get_winner(self) -> np.ndarray:
+        return self.winner
+
+    def free_cols(self) -> np.ndarray:
+        """``(N, COLS)`` boolean mask of the columns that are not full."""
+        return self.heights < self.ROWS
+
+    def is_final(self) -> np.ndarray:
+        return (self.winner != 0) | ~self.free_cols().any(axis=1)
+
+    def _move_bits(self) -> np.ndarray:
+        """``(N, COLS)`` bitboard of the cell a tile dropped in each column would take."""
+        return _ONE << (_COL_BASE + self.heights.astype(np.uint64))
+
+    def winning_moves(self, player: np.ndarray | None = None) -> np.ndarray:
+        """
+        Columns that would immediately connect four for ``player``.
+
+        Parameters
+        ----------
+        player : np.ndarray, optional
+            Player per board; the player to move by default.
+
+        Returns
+        -------
+        np.ndarray
+            ``(N, COLS)`` boolean mask.
+        """
+        if player is None:
+            player = self.player
+        own = np.where(player == -1, self.red, self.yellow)
+        return self.free_cols() & _has_four(own[:, None] | self._move_bits())
+
+    def play(self, cols: np.ndarray) -> None:
+        """
+        Places a tile for the player to move on every unfinished board, in place.
+
+        Parameters
+        ----------
+        cols : np.ndarray
+            Column per board. Entries for finished boards are ignored.
+
+        Raises
+        ------
+        ValueError
+            If the column is not playable on some unfinished board.
+        """
+        cols = np.asarray(cols)
+        active = ~self.is_final()
+        idx = np.flatnonzero(active)
+        cols = cols[idx]
+        if np.any((cols < 0) | (cols >= self.COLS)) or np.any(
+            self.heights[idx, cols.clip(0, self.COLS - 1)] >= self.ROWS
+        ):
+            raise ValueError("Move not allowed in some column.")
+
+        move = _ONE << (_COL_BASE[cols] + self.heights[idx, cols].astype(np.uint64))
+        red_turn = self.player[idx] == -1
+        self.red[idx] |= np.where(red_turn, move, 0).astype(np.uint64)
+        self.yellow[idx] |= np.where(red_turn, 0, move).astype(np.uint64)
+        self.heights[idx, cols] += 1
+
+        own = np.where(red_turn, self.red[idx], self.yellow[idx])
+        self.winner[idx] = np.where(_has_four(own), self.player[idx], 0)
+        self.player[idx] = -self.player[idx]
+
+    def transition(self, cols: np.ndarray) -> "BatchConnectState":
+        """Same as ``play`` but returns a new batch and leaves this one untouched."""
+        batch = self.copy()
+        batch.play(cols)
+        return batch
+
+    def random_moves(self, rng: np.random.Generator) -> np.ndarray:
+        """A uniformly random free column per board (0 for finished boards)."""
+        free = self.free_cols()
+        return np.argmax(rng.random(free.shape) * free, axis=1)
+
+    def heuristic_moves(self, rng: np.random.Generator) -> np.ndarray:
+        """
+        Win if possible, otherwise block the opponent's immediate win,
+        otherwise play a random free column (the MCTS rollout rule).
+        """
+        moves = self.random_moves(rng)
+        blocks = self.winning_moves(-self.player)
+        wins = self.winning_moves()
+        # argmax returns the first matching column, like the sequential scan
+        moves = np.where(blocks.any(axis=1), np.argmax(blocks, axis=1), moves)
+        moves = np.where(wins.any(axis=1), np.argmax(wins, axis=1), moves)
+        return moves
+
+    def play_out(self, rng: np.random.Generator, heuristic: bool = True) -> np.ndarray:
+        """
+        Plays every board to the end in place.
+
+        Parameters
+        ----------
+        rng : np.random.Generator
+            Source of the random moves.
+        heuristic : bool, optional
+            Use ``heuristic_moves`` (default) or ``random_moves`` for both players.
+
+        Returns
+        -------
+        np.ndarray
+            Winner per board (-1, 1, or 0 for a draw).
+        """
+        while not self.is_final().all():
+            if heuristic:
+                self.play(self.heuristic_moves(rng))
+            else:
+                self.play(self.random_moves(rng))
+        return self.winner.copy()
@@ -2,26 +2,272 @@
 from connect4.environment_state import EnvironmentState
 
 # Types
-from typing import Any
+from typing import Any, Iterable, Iterator
 
 # Libraries
 import numpy as np
 import matplotlib.pyplot as plt
 
+# Bitboard layout: every column takes ROWS + 1 bits, the extra one being an
+# always-empty sentinel that stops shifted lines from wrapping into the next
+# column. Bit ``col * (ROWS + 1) + h`` is the cell at height ``h`` (0 = bottom)
+# of column ``col``, i.e. board cell ``[ROWS - 1 - h, col]``.
+_ROWS = 6
+_COLS = 7
+_H1 = _ROWS + 1
+
+_COLUMN = [((1 << _ROWS) - 1) << (c * _H1) for c in range(_COLS)]
+_BOTTOM_ROW = sum(1 << (c * _H1) for c in range(_COLS))
+_BOARD_MASK = sum(_COLUMN)
+
+# First bit above the board, used to tag the player to move in position keys
+_SIDE_BIT = 1 << (_COLS * _H1)
+
+# Bit index of every board cell, used to convert between both representations
+_CELL_INDEX = np.array(
+    [[c * _H1 + (_ROWS - 1 - r) for c in range(_COLS)] for r in range(_ROWS)],
+    dtype=np.int64,
+)
+_CELL_WEIGHT = np.left_shift(np.int64(1), _CELL_INDEX)
+
+
+def _build_lines() -> list[list[int]]:
+    """For every bit index, the masks of the four-in-a-row windows covering it."""
+    lines: list[list[int]] = [[] for _ in range(_COLS * _H1)]
+    for dc, dh in ((1, 0), (0, 1), (1, 1), (1, -1)):
+        for c in range(_COLS):
+            for h in range(_ROWS):
+                cells = [(c + i * dc, h + i * dh) for i in range(4)]
+                if not all(0 <= cc < _COLS and 0 <= hh < _ROWS for cc, hh in cells):
+                    continue
+                window = sum(1 << (cc * _H1 + hh) for cc, hh in cells)
+                for cc, hh in cells:
+                    lines[cc * _H1 + hh].append(window)
+    return lines
+
+
+_LINES = _build_lines()
+
+# Playable columns for every legal-move bitmask (bit ``c`` set = column ``c`` free)
+_FREE_COLS = [
+    tuple(c for c in range(_COLS) if legal >> c & 1) for legal in range(1 << _COLS)
+]
+
+
+def _has_four(bits: int) -> bool:
+    """Whether ``bits`` holds four aligned stones (vertical, horizontal, both diagonals)."""
+    for shift in (1, _H1, _H1 - 1, _H1 + 1):
+        pairs = bits & (bits >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+
+def _completes_line(bits: int, index: int) -> bool:
+    """Whether the stone at bit ``index`` is part of a four-in-a-row of ``bits``."""
+    for line in _LINES[index]:
+        if bits & line == line:
+            return True
+    return False
+
+
+def _winning_cells(bits: int, filled: int) -> int:
+    """Empty cells (playable or not) that would complete a four-in-a-row of ``bits``."""
+    # Vertical: only the cell right above three stacked stones
+    cells = (bits << 1) & (bits << 2) & (bits << 3)
+    for shift in (_H1, _H1 - 1, _H1 + 1):
+        # Cell with two stones on one side and the third on either side
+        pair = (bits << shift) & (bits << (2 * shift))
+        cells |= pair & (bits << (3 * shift))
+        cells |= pair & (bits >> shift)
+        pair = (bits >> shift) & (bits >> (2 * shift))
+        cells |= pair & (bits << shift)
+        cells |= pair & (bits >> (3 * shift))
+    return cells & (_BOARD_MASK ^ filled)
+
+
+def _mirror_bits(bits: int) -> int:
+    """Reflects a bitboard (or key) left to right by swapping whole ``ROWS + 1`` bit columns."""
+    mirrored = 0
+    for c in range(_COLS):
+        column = (bits >> (c * _H1)) & ((1 << _H1) - 1)
+        mirrored |= column << ((_COLS - 1 - c) * _H1)
+    return mirrored
+
+
+def _playable_cells(filled: int) -> int:
+    """Lowest empty cell of every column that is not full."""
+    # Adding the bottom row carries into the lowest empty cell of each column
+    return (filled + _BOTTOM_ROW) & _BOARD_MASK
+
 
 class ConnectState(EnvironmentState):
-    ROWS = 6
-    COLS = 7
+    ROWS = _ROWS
+    COLS = _COLS
+    CENTER_ORDER = (3, 2, 4, 1, 5, 0, 6)
+
+    # No per-instance __dict__: search trees keep one state per node
+    __slots__ = (
+        "red",
+        "yellow",
+        "filled",
+        "player",
+        "winner",
+        "heights",
+        "legal",
+        "moves",
+        "_board",
+    )
 
     def __init__(self, board: np.ndarray | None = None, player: int = -1):
         if board is None:
-            self.board = np.zeros((self.ROWS, self.COLS), dtype=int)
+            self._load(0, 0, player)
         else:
-            self.board = board.copy()
+            self._load(
+                int(_CELL_WEIGHT[board == -1].sum()),
+                int(_CELL_WEIGHT[board == 1].sum()),
+                player,
+            )
+
+    def _load(self, red: int, yellow: int, player: int) -> None:
+        self.red = red
+        self.yellow = yellow
+        self.filled = red | yellow
         self.player = player  # -1 = Red, 1 = Yellow type: ignore
+        self.winner = -1 if _has_four(red) else 1 if _has_four(yellow) else 0
+        # One byte per column (int8-sized storage, mutable for play/undo)
+        self.heights = bytearray(
+            ((self.filled & _COLUMN[c]) >> (c * _H1)).bit_length()
+            for c in range(self.COLS)
+        )
+        self.legal = sum(
+            1 << c for c in range(self.COLS) if self.heights[c] < self.ROWS
+        )
+        self.moves: list[tuple[int, int, int, int]] | None = None
+        self._board = None
+
+    @classmethod
+    def from_bits(cls, red: int, yellow: int, player: int = -1) -> "ConnectState":
+        """
+        Builds a state from the bitboards of both players, e.g. a position
+        stored compactly as two integers outside of a ConnectState.
+        """
+        state = cls.__new__(cls)
+        state._load(red, yellow, player)
+        return state
+
+    @classmethod
+    def _from_bits(
+        cls,
+        red: int,
+        yellow: int,
+        player: int,
+        winner: int,
+        heights: bytearray,
+        legal: int,
+    ) -> "ConnectState":
+        state = cls.__new__(cls)
+        state.red = red
+        state.yellow = yellow
+        state.filled = red | yellow
+        state.player = player
+        state.winner = winner
+        state.heights = heights
+        state.legal = legal
+        state.moves = None
+        state._board = None
+        return state
+
+    def copy(self) -> "ConnectState":
+        """Independent copy of the position (without the undo history)."""
+        return ConnectState._from_bits(
+            self.red,
+            self.yellow,
+            self.player,
+            self.winner,
+            self.heights.copy(),
+            self.legal,
+        )
+
+    @property
+    def key(self) -> int:
+        """
+        Unique integer identifying the position and the player to move.
+
+        Each column of ``red + filled`` holds its filled bits plus the red ones,
+        which stays inside the column's ``ROWS + 1`` bits and can be decoded back
+        into the column, so the sum is unique. Bit ``COLS * (ROWS + 1)`` is set
+        when Yellow moves. The key fits in 64 bits and, being derived from the
+        bitboards, is kept up to date by ``transition``, ``play`` and ``undo``
+        at no extra cost.
+        """
+        key = self.red + self.filled
+        return key | _SIDE_BIT if self.player == 1 else key
+
+    @property
+    def mirror_key(self) -> int:
+        """``key`` of the left-right mirrored position."""
+        # The key is built column by column, so mirroring it mirrors the position
+        return _mirror_bits(self.red + self.filled) | (self.key & _SIDE_BIT)
+
+    @property
+    def canonical_key(self) -> int:
+        """Same key for a position and its mirror image: the smaller of both."""
+        return min(self.key, self.mirror_key)
+
+    def is_mirrored(self) -> bool:
+        """Whether the canonical form of this position is its mirror image."""
+        return self.mirror_key < self.key
+
+    @classmethod
+    def mirror_move(cls, col: int) -> int:
+        """Column ``col`` seen in the mirrored position."""
+        return cls.COLS - 1 - col
+
+    def canonical_move(self, col: int) -> int:
+        """
+        Maps a column between this position and its canonical form.
+
+        The mapping is its own inverse: it translates moves of this position
+        into the canonical one and canonical moves (e.g. read from a cache
+        keyed by ``canonical_key``) back into this position.
+        """
+        return self.COLS - 1 - col if self.is_mirrored() else col
+
+    def mirror(self) -> "ConnectState":
+        """Left-right mirrored copy of the position (without the undo history)."""
+        legal = 0
+        for c in range(self.COLS):
+            if self.legal >> c & 1:
+                legal |= 1 << (self.COLS - 1 - c)
+        return ConnectState._from_bits(
+            _mirror_bits(self.red),
+            _mirror_bits(self.yellow),
+            self.player,
+            self.winner,
+            self.heights[::-1],
+            legal,
+        )
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ConnectState):
+            return NotImplemented
+        return self.key == other.key
+
+    @property
+    def board(self) -> np.ndarray:
+        """Read-only ``ROWS x COLS`` view of the position, built on first access."""
+        if self._board is None:
+            board = ((self.yellow >> _CELL_INDEX) & 1) - ((self.red >> _CELL_INDEX) & 1)
+            board.flags.writeable = False
+            self._board = board
+        return self._board
 
     def is_final(self) -> bool:
-        return self.get_winner() != 0 or not any(self.board[0] == 0)
+        return self.winner != 0 or not self.legal
 
     def is_applicable(self, event: Any) -> bool:
         return (
@@ -32,69 +278,192 @@ class ConnectState(EnvironmentState):
         )
 
     def get_winner(self) -> int:
-        # Check all 4 directions
-        for r in range(self.ROWS):
-            for c in range(self.COLS):
-                player = self.board[r, c]
-                if player == 0:
-                    continue
+        return self.winner
 
-                # Right
-                if c + 3 < self.COLS and all(
-                    self.board[r, c + i] == player for i in range(4)
-                ):
-                    return player
-                # Down
-                if r + 3 < self.ROWS and all(
-                    self.board[r + i, c] == player for i in range(4)
-                ):
-                    return player
-                # Diagonal right-down
-                if (
-                    r + 3 < self.ROWS
-                    and c + 3 < self.COLS
-                    and all(self.board[r + i, c + i] == player for i in range(4))
-                ):
-                    return player
-                # Diagonal left-down
-                if (
-                    r + 3 < self.ROWS
-                    and c - 3 >= 0
-                    and all(self.board[r + i, c - i] == player for i in range(4))
-                ):
-                    return player
-
-        return 0
+    def _move_columns(self, cells: int) -> list[int]:
+        return [c for c in _FREE_COLS[self.legal] if cells & _COLUMN[c]]
+
+    def winning_moves(self, player: int | None = None) -> list[int]:
+        """
+        Columns where ``player`` would connect four by dropping a tile now.
+
+        Parameters
+        ----------
+        player : int, optional
+            -1 (Red) or 1 (Yellow); the player to move by default.
+
+        Returns
+        -------
+        list[int]
+            Columns in ascending order.
+        """
+        if player is None:
+            player = self.player
+        bits = self.red if player == -1 else self.yellow
+        cells = _winning_cells(bits, self.filled) & _playable_cells(self.filled)
+        return self._move_columns(cells)
+
+    def blocking_moves(self, player: int | None = None) -> list[int]:
+        """
+        Columns ``player`` must take to stop an immediate win of the opponent.
+
+        More than one column means the opponent cannot be stopped.
+        """
+        if player is None:
+            player = self.player
+        return self.winning_moves(-player)
+
+    def double_threat_moves(self, player: int | None = None) -> list[int]:
+        """
+        Columns after which ``player`` threatens to win in two or more columns
+        at once, so the opponent can block only one of them.
+        """
+        if player is None:
+            player = self.player
+        bits = self.red if player == -1 else self.yellow
+        playable = _playable_cells(self.filled)
+        # A move that already wins is not a threat
+        playable &= ~_winning_cells(bits, self.filled)
+        moves = []
+        for col in _FREE_COLS[self.legal]:
+            move = playable & _COLUMN[col]
+            if not move:
+                continue
+            filled = self.filled | move
+            threats = _winning_cells(bits | move, filled) & _playable_cells(filled)
+            if threats & (threats - 1):
+                moves.append(col)
+        return moves
 
     def is_col_free(self, col: int) -> bool:
-        return self.board[0, col] == 0
+        return bool(self.legal >> col & 1)
 
     def get_heights(self) -> list[int]:
-        heights = []
-        for c in range(self.COLS):
-            col = self.board[:, c]
-            for r in range(self.ROWS):
-                if col[r] != 0:
-                    heights.append(self.ROWS - r)
-                    break
-            else:
-                heights.append(0)
-        return heights
+        return list(self.heights)
 
     def get_free_cols(self) -> list[int]:
-        return [c for c in range(self.COLS) if self.is_col_free(c)]
+        return list(_FREE_COLS[self.legal])
+
+    def legal_moves(self, order: Iterable[int] | None = None) -> Iterator[int]:
+        """
+        Yields the playable columns, following ``order`` when given.
 
-    def transition(self, col: int) -> "ConnectState":
-        if not self.is_applicable(col):
+        Parameters
+        ----------
+        order : Iterable[int], optional
+            Columns in the order they should be tried, e.g. ``CENTER_ORDER``.
+            Left to right by default.
+        """
+        if order is None:
+            yield from _FREE_COLS[self.legal]
+            return
+        legal = self.legal
+        for col in order:
+            if legal >> col & 1:
+                yield col
+
+    def transition(self, col: int, validate: bool = True) -> "ConnectState":
+        """
+        Returns the state reached by dropping a tile in ``col``.
+
+        Parameters
+        ----------
+        col : int
+            Column where the tile is dropped.
+        validate : bool, optional
+            Check the move with ``is_applicable`` first (default). Search code
+            that takes its moves from ``get_free_cols``/``legal_moves`` of a
+            non-final state can skip the check; an invalid move then yields a
+            meaningless state instead of raising.
+
+        Raises
+        ------
+        ValueError
+            If ``validate`` is set and the move is invalid.
+        """
+        if validate and not self.is_applicable(col):
             raise ValueError(f"Move not allowed in column {col}.")
 
-        new_board = self.board.copy()
-        for r in reversed(range(self.ROWS)):
-            if new_board[r, col] == 0:
-                new_board[r, col] = self.player
-                break
+        height = self.heights[col]
+        move = 1 << (col * _H1 + height)
+        heights = self.heights.copy()
+        heights[col] = height + 1
+        legal = self.legal
+        if height + 1 == self.ROWS:
+            legal &= ~(1 << col)
+
+        red, yellow = self.red, self.yellow
+        if self.player == -1:
+            red |= move
+            own = red
+        else:
+            yellow |= move
+            own = yellow
+
+        # Only lines through the new stone can have been completed
+        winner = self.player if _completes_line(own, move.bit_length() - 1) else 0
+
+        return ConnectState._from_bits(
+            red, yellow, -self.player, winner, heights, legal
+        )
+
+    def play(self, col: int) -> None:
+        """
+        Places a tile in ``col`` for the active player, modifying this state in place.
 
-        return ConnectState(new_board, -self.player)
+        Unlike ``transition`` the move is not validated: search code is expected
+        to pass a column taken from ``get_free_cols``. Every call is recorded so
+        it can be reverted with ``undo``.
+
+        Parameters
+        ----------
+        col : int
+            Column where the tile is dropped.
+        """
+        if self.moves is None:
+            self.moves = []
+        self.moves.append((col, self.player, self.winner, self.legal))
+
+        height = self.heights[col]
+        index = col * _H1 + height
+        move = 1 << index
+        self.heights[col] = height + 1
+        if height + 1 == self.ROWS:
+            self.legal &= ~(1 << col)
+
+        self.filled |= move
+        if self.player == -1:
+            self.red |= move
+            if _completes_line(self.red, index):
+                self.winner = -1
+        else:
+            self.yellow |= move
+            if _completes_line(self.yellow, index):
+                self.winner = 1
+        self.player = -self.player
+        self._board = None
+
+    def undo(self) -> None:
+        """
+        Reverts the last move made with ``play``.
+
+        Raises
+        ------
+        IndexError
+            If there is no move to revert.
+        """
+        if not self.moves:
+            raise IndexError("No move to undo.")
+        col, self.player, self.winner, self.legal = self.moves.pop()
+
+        self.heights[col] -= 1
+        move = 1 << (col * _H1 + self.heights[col])
+        self.filled ^= move
+        if self.player == -1:
+            self.red ^= move
+        else:
+            self.yellow ^= move
+        self._board = None
 
     def show(self, size: int = 1500, ax: plt.Axes | None = None) -> None:
         if ax is None:
@@ -0,0 +1,195 @@
+import os
+import functools
+import pathlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable
+
+import numpy as np
+
+from connect4.connect_state import ConnectState
+from connect4.policy import Policy
+from connect4.solver import Solver
+from connect4.utils import find_importable_classes
+
+# One record per canonical position, sorted by key
+BOOK_DTYPE = np.dtype([("key", "<u8"), ("move", "i1")])
+
+
+class OpeningBook:
+    """
+    Read-only table of canonical position keys -> best move.
+
+    The file is a ``.npy`` array of ``BOOK_DTYPE`` records sorted by key. It is
+    memory-mapped, so opening it costs nothing and a lookup is a binary search
+    over the mapped keys.
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = pathlib.Path(path)
+        self.table = np.load(self.path, mmap_mode="r")
+        self.keys = self.table["key"]
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def open(cls, path: str) -> "OpeningBook":
+        """Shared instance per path, so every policy object maps the file once."""
+        return cls(path)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, state: ConnectState) -> int | None:
+        """
+        Best move stored for ``state`` (or its mirror image).
+
+        Returns
+        -------
+        int | None
+            Column to play in ``state``, or None if the position is not in the book.
+        """
+        key = state.canonical_key
+        i = int(np.searchsorted(self.keys, key))
+        if i == len(self.keys) or int(self.keys[i]) != key:
+            return None
+        return state.canonical_move(int(self.table["move"][i]))
+
+
+def book_positions(plies: int) -> list[ConnectState]:
+    """
+    Canonical representatives of every unfinished position with fewer than
+    ``plies`` tiles on the board, i.e. every position where one of the first
+    ``plies`` moves has to be chosen.
+    """
+    positions = []
+    frontier = {0: ConnectState()}
+    for _ in range(plies):
+        next_frontier: dict[int, ConnectState] = {}
+        for state in frontier.values():
+            if state.is_final():
+                continue
+            positions.append(state.mirror() if state.is_mirrored() else state)
+            for col in state.get_free_cols():
+                child = state.transition(col, validate=False)
+                next_frontier.setdefault(child.canonical_key, child)
+        frontier = next_frontier
+    return positions
+
+
+# Search function of each build process, set up once by _init_worker; None = no entry
+_searcher: Callable[[ConnectState], int | None] | None = None
+
+
+def _init_worker(
+    groups: str, policy_name: str | None, mount_kwargs: dict[str, Any]
+) -> None:
+    global _searcher
+    if policy_name is None:
+        # One solver per process: its table keeps the proven results between positions
+        solver = Solver()
+        solver.mount(**mount_kwargs)
+
+        def solve(state: ConnectState) -> int | None:
+            move = int(solver.act(np.array(state.board)))
+            # A depth-limited score is 0 for every move: only proven moves go in the book
+            return move if solver.last_solution.exact else None
+
+        _searcher = solve
+        return
+
+    policy_class = find_importable_classes(groups, Policy)[policy_name]
+
+    def search(state: ConnectState) -> int:
+        # A fresh policy per position: no tree or statistics leak between entries
+        policy = policy_class()
+        policy.mount(**mount_kwargs)
+        return int(policy.act(np.array(state.board)))
+
+    _searcher = search
+
+
+def _evaluate(bits: tuple[int, int, int]) -> tuple[int, int | None]:
+    state = ConnectState.from_bits(*bits)
+    return state.key, _searcher(state)
+
+
+def build_opening_book(
+    output: str | os.PathLike,
+    plies: int,
+    policy_name: str | None = None,
+    mount_kwargs: dict[str, Any] | None = None,
+    groups: str = "groups",
+    workers: int | None = None,
+) -> int:
+    """
+    Searches every position of the first ``plies`` moves and writes the book.
+
+    With the solver, positions it cannot prove within its ``time_ms`` are left
+    out of the book. Finished entries are appended to ``<output>.partial`` as
+    soon as a worker returns them, so an interrupted build resumes where it
+    stopped. The sorted book replaces ``output`` atomically once every position
+    is done.
+
+    Parameters
+    ----------
+    output : str | os.PathLike
+        Path of the ``.npy`` book.
+    plies : int
+        Number of opening moves covered by the book.
+    policy_name : str, optional
+        Participant (folder under ``groups``) whose ``act`` picks each move. By
+        default the exact ``Solver`` from ``connect4.solver`` does.
+    mount_kwargs : dict, optional
+        Arguments for the policy's ``mount``, e.g. a large search budget.
+    groups : str, optional
+        Folder the policies are loaded from (default is "groups").
+    workers : int, optional
+        Number of build processes (default is the number of CPUs).
+
+    Returns
+    -------
+    int
+        Number of positions in the book.
+    """
+    output = pathlib.Path(output)
+    partial = output.with_name(output.name + ".partial")
+
+    done: dict[int, int] = {}
+    if partial.exists():
+        with open(partial) as f:
+            for line in f:
+                # The last line may have been cut off by the interruption
+                try:
+                    key, move = map(int, line.split())
+                except ValueError:
+                    continue
+                done[key] = move
+
+    pending = [s for s in book_positions(plies) if s.key not in done]
+    print(f"Opening book: {len(done)} positions done, {len(pending)} pending")
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(groups, policy_name, mount_kwargs or {}),
+    ) as pool, open(partial, "a") as f:
+        futures = [pool.submit(_evaluate, (s.red, s.yellow, s.player)) for s in pending]
+        skipped = 0
+        for i, future in enumerate(as_completed(futures), start=1):
+            key, move = future.result()
+            if move is None:
+                skipped += 1
+            else:
+                done[key] = move
+                f.write(f"{key} {move}\n")
+                f.flush()
+            if i % 100 == 0:
+                print(f"Opening book: {i}/{len(pending)}")
+    if skipped:
+        print(f"Opening book: {skipped} positions left out, not solved in time")
+
+    table = np.array(sorted(done.items()), dtype=BOOK_DTYPE)
+    tmp = output.with_name(output.name + ".tmp.npy")
+    np.save(tmp, table)
+    os.replace(tmp, output)
+    partial.unlink()
+    return len(table)
@@ -1,5 +1,23 @@
 import numpy as np
 from abc import ABC, abstractmethod
+from typing import NamedTuple
+
+from connect4.connect_state import ConnectState
+
+
+class Turn(NamedTuple):
+    """
+    Everything the runner knows when it asks a policy for a move.
+
+    ``state`` is the live game state: a policy may read it, copy it or keep it,
+    but must leave it as it found it (``play`` must be paired with ``undo``).
+    ``time_left`` is the mover's remaining clock in seconds, or None without one.
+    """
+
+    state: ConnectState
+    player: int
+    last_move: int | None
+    time_left: float | None
 
 
 class Policy(ABC):
@@ -11,3 +29,21 @@ class Policy(ABC):
     @abstractmethod
     def act(self, s: np.ndarray) -> int:
         pass
+
+    def act_turn(self, turn: Turn) -> int:
+        """
+        Protocol v2: same as ``act`` but receives the runner's ``Turn``.
+
+        Policies that override it get the live state, side to move, last move
+        and clock instead of a bare board; by default it just calls ``act``.
+        """
+        return self.act(turn.state.board)
+
+    def stop_pondering(self) -> None:
+        """Stops any search the policy keeps running after ``act`` returns (none by default)."""
+        pass
+
+
+def uses_turns(policy: Policy) -> bool:
+    """True if ``policy`` implements protocol v2 (overrides ``act_turn``)."""
+    return type(policy).act_turn is not Policy.act_turn
@@ -0,0 +1,54 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+
+@dataclass(slots=True)
+class MoveStats:
+    """
+    What a search policy did for one ``act`` call.
+
+    Times are in seconds. The per-phase times and ``rollout_plies`` stay at 0
+    unless the policy was mounted with profiling on.
+    """
+
+    iterations: int = 0
+    nodes: int = 0
+    max_depth: int = 0
+    rollout_plies: int = 0
+    select_time: float = 0.0
+    expand_time: float = 0.0
+    simulate_time: float = 0.0
+    backprop_time: float = 0.0
+    elapsed: float = 0.0
+    stop_reason: str = ""
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+# Anything that takes a record: a plain function, a list's append, a StatsBuffer...
+StatsSink = Callable[[MoveStats], None]
+
+
+class StatsBuffer:
+    """Sink that keeps the last ``size`` records, oldest first."""
+
+    def __init__(self, size: int = 1024):
+        self.records: deque[MoveStats] = deque(maxlen=size)
+
+    def __call__(self, stats: MoveStats) -> None:
+        self.records.append(stats)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[MoveStats]:
+        return iter(self.records)
+
+    def __getitem__(self, i: int) -> MoveStats:
+        return self.records[i]
+
+    def clear(self) -> None:
+        self.records.clear()
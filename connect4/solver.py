@@ -0,0 +1,272 @@
+# Abstract
+from connect4.policy import Policy, Turn
+
+# Types
+from typing import NamedTuple
+
+# Libraries
+import time
+import numpy as np
+
+# Bitboard helpers shared with the state; see connect4/connect_state.py for the layout
+from connect4.connect_state import (
+    ConnectState,
+    _COLUMN,
+    _playable_cells,
+    _winning_cells,
+)
+
+_CELLS = ConnectState.ROWS * ConnectState.COLS
+
+# Transposition table entry flags
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class Solution(NamedTuple):
+    """
+    Result of ``solve``, from the point of view of the player to move.
+
+    ``score`` is positive for a win, negative for a loss and 0 for a draw; the
+    sooner the game ends, the larger its magnitude: ``(44 - n) // 2`` when the
+    winning tile is the ``n``-th of the game. ``exact`` is False when the time
+    ran out first, in which case ``move`` comes from the deepest finished search.
+    """
+
+    score: int
+    move: int | None
+    exact: bool
+    nodes: int
+
+
+_Entry = tuple[int, int, int, int, int | None, bool]
+
+
+class TranspositionTable:
+    """
+    Fixed number of slots indexed by ``key % size``; a new entry replaces the old one.
+
+    Each entry remembers whether its value came from a subtree cut at the depth
+    limit (``horizon``). Only those depend on the depth they were searched at;
+    the rest are game-theoretic bounds, valid for any later search.
+    """
+
+    def __init__(self, size: int = 1_000_003):
+        self.size = size
+        self.entries: list[_Entry | None] = [None] * size
+
+    def get(self, key: int) -> _Entry | None:
+        entry = self.entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def put(
+        self,
+        key: int,
+        depth: int,
+        flag: int,
+        value: int,
+        move: int | None,
+        horizon: bool,
+    ) -> None:
+        self.entries[key % self.size] = (key, depth, flag, value, move, horizon)
+
+
+class _Timeout(Exception):
+    pass
+
+
+class _Search:
+    """
+    Depth-limited negamax with alpha-beta over raw bitboards.
+
+    ``position`` holds the stones of the player to move and ``mask`` every
+    stone, so ``position + mask`` identifies the node. A node at the depth limit
+    scores 0 and sets ``horizon``, and so does a table entry that came from one:
+    a 0 is only a proven draw if no node hit it.
+    """
+
+    def __init__(self, table: TranspositionTable, deadline: float | None):
+        self.table = table
+        self.deadline = deadline
+        self.nodes = 0
+        self.horizon = False
+
+    def ordered(self, possible: int, first: int | None) -> list[int]:
+        cols = [c for c in ConnectState.CENTER_ORDER if possible & _COLUMN[c]]
+        if first in cols:
+            cols.remove(first)
+            cols.insert(0, first)
+        return cols
+
+    def negamax(
+        self, position: int, mask: int, moves: int, depth: int, alpha: int, beta: int
+    ) -> int:
+        self.nodes += 1
+        if (
+            self.deadline is not None
+            and self.nodes & 255 == 0
+            and time.monotonic() > self.deadline
+        ):
+            raise _Timeout
+
+        playable = _playable_cells(mask)
+        if _winning_cells(position, mask) & playable:
+            return (_CELLS + 1 - moves) // 2
+        if moves >= _CELLS - 1:
+            return 0
+
+        # Keep only moves that do not hand the opponent an immediate win
+        opponent = position ^ mask
+        threats = _winning_cells(opponent, mask)
+        possible = playable
+        forced = possible & threats
+        if forced:
+            if forced & (forced - 1):
+                return -((_CELLS - moves) // 2)
+            possible = forced
+        possible &= ~(threats >> 1)
+        if not possible:
+            return -((_CELLS - moves) // 2)
+
+        if depth == 0:
+            self.horizon = True
+            return 0
+
+        key = position + mask
+        entry = self.table.get(key)
+        first = None
+        if entry is not None:
+            _, entry_depth, flag, value, first, entry_horizon = entry
+            if not entry_horizon or entry_depth >= depth:
+                if entry_horizon:
+                    self.horizon = True
+                if flag == EXACT:
+                    return value
+                if flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        # Track whether this subtree alone hits the depth limit
+        outer_horizon = self.horizon
+        self.horizon = False
+        original_alpha = alpha
+        best, best_move = -_CELLS, None
+        for col in self.ordered(possible, first):
+            score = -self.negamax(
+                opponent,
+                mask | (possible & _COLUMN[col]),
+                moves + 1,
+                depth - 1,
+                -beta,
+                -alpha,
+            )
+            if score > best:
+                best, best_move = score, col
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if best <= original_alpha:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.put(key, depth, flag, best, best_move, self.horizon)
+        self.horizon = self.horizon or outer_horizon
+        return best
+
+    def root(self, position: int, mask: int, moves: int, depth: int) -> tuple[int, int]:
+        # Every legal move is tried so that a lost position still returns one
+        playable = _playable_cells(mask)
+        alpha, beta = -_CELLS, _CELLS
+        best, best_move = -_CELLS - 1, None
+        for col in self.ordered(playable, None):
+            move = playable & _COLUMN[col]
+            if _winning_cells(position, mask) & move:
+                return (_CELLS + 1 - moves) // 2, col
+            score = -self.negamax(
+                position ^ mask, mask | move, moves + 1, depth - 1, -beta, -alpha
+            )
+            if score > best:
+                best, best_move = score, col
+            alpha = max(alpha, score)
+        return best, best_move
+
+
+def solve(
+    state: ConnectState,
+    time_ms: float | None = None,
+    table: TranspositionTable | None = None,
+) -> Solution:
+    """
+    Solves ``state`` with iterative deepening until the result is proven.
+
+    Parameters
+    ----------
+    state : ConnectState
+        Position to solve; it must not be final.
+    time_ms : float, optional
+        Time budget; unlimited by default.
+    table : TranspositionTable, optional
+        Table to reuse between calls (a new one is made by default).
+
+    Returns
+    -------
+    Solution
+        Score, best move and whether the result is exact.
+    """
+    deadline = None if time_ms is None else time.monotonic() + time_ms / 1000
+    search = _Search(table if table is not None else TranspositionTable(), deadline)
+
+    position = state.red if state.player == -1 else state.yellow
+    mask = state.filled
+    moves = mask.bit_count()
+
+    solution = Solution(0, None, False, 0)
+    for depth in range(1, _CELLS - moves + 1):
+        search.horizon = False
+        try:
+            score, move = search.root(position, mask, moves, depth)
+        except _Timeout:
+            break
+        # A win or a loss never depends on the horizon; a draw does
+        exact = score != 0 or not search.horizon
+        solution = Solution(score, move, exact, search.nodes)
+        if exact:
+            break
+
+    if solution.move is None:
+        # Not even the first iteration finished: any legal move, center first
+        move = next(state.legal_moves(ConnectState.CENTER_ORDER))
+        solution = Solution(0, move, False, search.nodes)
+    return solution
+
+
+class Solver(Policy):
+    """Perfect-play policy: negamax with alpha-beta, iterative deepening and a transposition table."""
+
+    def __init__(self):
+        self.time_ms = 1000.0
+        self.table = TranspositionTable()
+        self.last_solution: Solution | None = None
+
+    def mount(
+        self, time_ms: float | None = 1000.0, table_size: int = 1_000_003
+    ) -> None:
+        self.time_ms = time_ms
+        self.table = TranspositionTable(table_size)
+
+    def act(self, s: np.ndarray) -> int:
+        # Red moves whenever both players have the same number of tiles
+        player = -1 if np.count_nonzero(s == 1) == np.count_nonzero(s == -1) else 1
+        self.last_solution = solve(ConnectState(s, player), self.time_ms, self.table)
+        return self.last_solution.move
+
+    def act_turn(self, turn: Turn) -> int:
+        self.last_solution = solve(turn.state, self.time_ms, self.table)
+        return self.last_solution.move
@@ -1,13 +1,34 @@
+import os
 import math
+import time
+import pathlib
 import random
+import atexit
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from connect4.policy import Policy
 from connect4.connect_state import ConnectState
+from connect4.batch_connect_state import BatchConnectState
+from connect4.opening_book import OpeningBook
+from connect4.solver import solve, TranspositionTable
+from connect4.search_stats import MoveStats
+
+# Libro de aperturas generado con build_opening_book.py
+BOOK_PATH = pathlib.Path(__file__).with_name("opening_book.npy")
 
 class MCTS(Policy):
-    last_instance = None
+    stats_sink = None   # destino de un MoveStats por jugada (función o StatsBuffer); None = sin estadísticas
+    pools = {}   # procesos compartidos por todas las instancias, uno por número de workers
+    endgame_table = None   # tabla del solver exacto, compartida por todas las instancias
+    scores = None          # ScoreCache de las heurísticas de la raíz, compartida por todas las instancias
 
     class Node():
+        # Sin __dict__ por nodo: ~590 bytes por nodo (estado incluido) frente a ~950 con el tablero numpy
+        __slots__ = ("state", "parent", "action", "children", "N", "R", "candidates_actions", "solved", "AN", "AR")
+
         def __init__(self, state, parent, action):
             self.state = state
             self.parent = parent 
@@ -15,26 +36,294 @@ class MCTS(Policy):
             self.children = {}            
             self.N = 0                    
             self.R = 0                
-            self.candidates_actions = list(state.get_free_cols())
+            self.candidates_actions = state.get_free_cols()
+            self.solved = state.winner if state.is_final() else None   # ganador con juego perfecto, si ya está probado
+            self.AN = None                # AMAF (RAVE) por columna: simulaciones desde aquí donde quien
+            self.AR = None                # mueve jugó esa columna más adelante (None sin RAVE)
+
+    class Table():
+        'Tabla de transposición: clave de la posición -> nodo, con un máximo de entradas'
+
+        POLICIES = ("lru", "least_visited")
+
+        def __init__(self, size: int, policy: str = "lru"):
+            if policy not in self.POLICIES:
+                raise ValueError(f"Unknown eviction policy {policy!r}.")
+            self.size = size
+            self.policy = policy
+            self.nodes = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+
+        def get(self, key):
+            node = self.nodes.get(key)
+            if node is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if self.policy == "lru":
+                self.nodes.move_to_end(key)
+            return node
+
+        def put(self, key, node):
+            self.nodes[key] = node
+            if len(self.nodes) > self.size:
+                self.evict()
+
+        def evict(self):
+            if self.policy == "lru":
+                while len(self.nodes) > self.size:
+                    self.nodes.popitem(last=False)
+                return
+
+            # Menos visitados: se saca un 10% extra de una vez para no ordenar en cada inserción
+            extra = len(self.nodes) - self.size + self.size // 10
+            for key in sorted(self.nodes, key=lambda k: self.nodes[k].N)[:extra]:
+                del self.nodes[key]
+
+        def clear(self):
+            self.nodes.clear()
+
+        def prune(self, pieces: int):
+            # Las posiciones con menos fichas que la raíz ya no se pueden alcanzar
+            for key in [k for k, n in self.nodes.items() if n.state.filled.bit_count() < pieces]:
+                del self.nodes[key]
+
+    class ScoreCache():
+        'Caché LRU: clave de la posición -> puntajes de root_scores, con contadores de aciertos'
+
+        def __init__(self, size: int):
+            self.size = size
+            self.scores = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+
+        def get(self, key):
+            scores = self.scores.get(key)
+            if scores is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.scores.move_to_end(key)
+            return scores
+
+        def put(self, key, scores):
+            self.scores[key] = scores
+            while len(self.scores) > self.size:
+                self.scores.popitem(last=False)
+
+    class Pool():
+        'Nodos en arreglos de numpy (struct of arrays): 41 bytes por posición del arreglo'
+
+        def __init__(self, capacity: int = 1 << 12):
+            self.size = 0
+            self.parent = np.full(capacity, -1, dtype=np.int32)
+            self.children = np.full(capacity, -1, dtype=np.int32)  # primer hijo: bloque de COLS posiciones, hijo = bloque + columna
+            self.move = np.full(capacity, -1, dtype=np.int8)
+            self.N = np.zeros(capacity, dtype=np.int32)
+            self.R = np.zeros(capacity, dtype=np.float64)
+            self.red = np.zeros(capacity, dtype=np.uint64)
+            self.yellow = np.zeros(capacity, dtype=np.uint64)
+            self.player = np.zeros(capacity, dtype=np.int8)
+            self.winner = np.zeros(capacity, dtype=np.int8)
+            self.candidates = np.zeros(capacity, dtype=np.uint8)  # jugadas sin expandir, un bit por columna
+            self.used = np.zeros(capacity, dtype=bool)  # la posición del bloque tiene un hijo expandido
+
+        def reset(self):
+            # Se vacía sin soltar la memoria para la siguiente jugada
+            self.size = 0
+
+        def allocate(self, count: int) -> int:
+            start = self.size
+            self.size += count
+            if self.size > len(self.N):
+                capacity = max(2 * len(self.N), self.size)
+                for name in ("parent", "children", "move", "N", "R", "red", "yellow",
+                             "player", "winner", "candidates", "used"):
+                    old = getattr(self, name)
+                    new = np.zeros(capacity, dtype=old.dtype)
+                    new[:len(old)] = old
+                    setattr(self, name, new)
+            block = slice(start, self.size)
+            self.parent[block] = -1
+            self.children[block] = -1
+            self.move[block] = -1
+            self.N[block] = 0
+            self.R[block] = 0
+            self.used[block] = False
+            return start
+
+        def store(self, index: int, state: ConnectState, parent: int, move: int, candidates: int):
+            self.parent[index] = parent
+            self.move[index] = move
+            self.red[index] = state.red
+            self.yellow[index] = state.yellow
+            self.player[index] = state.player
+            self.winner[index] = state.winner
+            self.candidates[index] = candidates
+            self.used[index] = True
+
+        def state(self, index: int) -> ConnectState:
+            return ConnectState.from_bits(int(self.red[index]), int(self.yellow[index]), int(self.player[index]))
 
     def __init__(self):
         self.T = 35
         self.C = 1.4
-        self.nodes_explored = []
-        MCTS.last_instance = self
-
-    def mount(self, T: int=42, C: float = 1.4):
+        self.reuse = False
+        self.time_ms = None
+        self.max_iterations = None
+        self.table = None         # tabla de transposición (None = árbol sin compartir nodos)
+        self.workers = 1
+        self.rollouts = 1
+        self.rng = np.random.default_rng()
+        self.pool_store = None    # Pool: árbol en arreglos en vez de objetos Node
+        self.solver = True
+        self.book = None
+        self.endgame = None       # fichas a partir de las cuales se resuelve la posición exacta
+        self.endgame_ms = 100
+        self.score_cache = None   # tamaño de la caché de heurísticas de la raíz (None = sin caché)
+        self.pondering = False    # seguir buscando en un hilo durante el turno del rival
+        self.pondered = False     # el árbol anterior se siguió buscando: se reutiliza
+        self.ponder_thread = None
+        self.ponder_stop = None
+        self.root = None          # árbol de la jugada anterior
+        self.last_action = None   # jugada que devolvimos desde ese árbol
+        self.profile = False      # tiempos por fase y jugadas de simulación en las estadísticas
+        self.rave = None          # constante de equivalencia de RAVE (None = sin AMAF)
+        self.min_iterations = 12  # criterios de parada anticipada, ver mount
+        self.stop_q = 0.7
+        self.stop_unreachable = False
+        self.stop_separation = None
+        self.stop_reason = None   # por qué paró la última búsqueda
+
+    def mount(self, T: int=42, C: float = 1.4, reuse: bool = False,
+              time_ms: float | None = None, max_iterations: int | None = None,
+              tt_size: int | None = None, tt_policy: str = "lru", workers: int = 1,
+              rollouts: int = 1, node_pool: int | None = None, solver: bool = True,
+              book: str | None = str(BOOK_PATH), endgame: int | None = 22,
+              endgame_ms: float = 100, score_cache: int | None = 1 << 16,
+              ponder: bool = False, stats=None, profile: bool = False,
+              rave: float | None = None, min_iterations: int = 12,
+              stop_q: float | None = 0.7, stop_unreachable: bool = False,
+              stop_separation: float | None = None):
+        # Con time_ms la búsqueda corre hasta el plazo (o max_iterations si se da);
+        # sin time_ms corre max_iterations o, por defecto, T iteraciones.
+        # reuse conserva el árbol entre jugadas: la raíz reutilizada se queda con los
+        # hijos de las jugadas permitidas y expande de una vez las que le falten. Está
+        # apagado por defecto porque en partidas contra la versión original quedó un
+        # poco por debajo de empezar cada jugada con un árbol nuevo.
+        # Con tt_size las transposiciones comparten nodo (N/R) en una tabla de
+        # a lo sumo tt_size entradas que se vacía con tt_policy ("lru" o "least_visited").
+        # tt_size limita el índice, no la memoria: un nodo que sale de la tabla sigue
+        # en el árbol a través de su padre. La tabla se vacía en cada jugada salvo
+        # cuando se reutiliza el árbol (reuse o ponder).
+        # Con workers > 1 cada proceso busca desde la misma raíz con otra semilla y
+        # empieza por otra de sus jugadas (como la selección no vuelve a expandir un
+        # nodo con hijos, cada proceso evalúa casi solo esa jugada); luego se juntan
+        # las visitas y recompensas de los hijos de la raíz (no se combina con
+        # tt_size, reuse ni ponder).
+        # Con rollouts > 1 cada hoja se simula rollouts veces a la vez sobre un
+        # BatchConnectState y se propaga el promedio.
+        # Con node_pool el árbol vive en un Pool de esa capacidad inicial que se
+        # reutiliza entre jugadas (no se combina con solver, rave, tt_size, reuse,
+        # ponder ni workers: hay que pasar solver=False).
+        # solver marca las posiciones ganadas/perdidas probadas, las sube con minimax,
+        # no vuelve a seleccionar subárboles resueltos y para en cuanto la raíz está
+        # resuelta.
+        # book es el libro de aperturas que se consulta antes de buscar (si el archivo existe)
+        # Desde endgame fichas en el tablero se prueba primero el solver exacto
+        # (connect4/solver.py) con endgame_ms de plazo; si no alcanza a probar el
+        # resultado se sigue con MCTS.
+        # score_cache guarda los puntajes heurísticos de la raíz por posición en una
+        # caché LRU compartida entre instancias (y partidas) de a lo sumo ese tamaño.
+        # Con ponder, después de cada jugada se expanden todas las respuestas del rival
+        # y se siguen buscando en un hilo hasta la siguiente llamada a act (o a
+        # stop_pondering); act reutiliza el subárbol de la respuesta que se jugó.
+        # stats recibe un MoveStats por jugada (si no se da se usa MCTS.stats_sink, que
+        # se puede fijar en la clase cuando el torneo crea las instancias). Con profile
+        # la búsqueda con nodos mide además cada fase; los nodos y la profundidad se
+        # cuentan siempre en el árbol final.
+        # Con rave cada simulación suma sus jugadas a las estadísticas AMAF de cada
+        # nodo del camino (todas las jugadas como si fueran la primera), expand abre
+        # la candidata con mejor promedio AMAF y select_ucb mezcla Q con el valor AMAF
+        # con peso sqrt(rave / (3 N + rave)), que se apaga a medida que el hijo tiene
+        # visitas propias. Es una simulación por hoja (no se combina con rollouts > 1).
+        # Parada anticipada (nunca antes de min_iterations; el motivo queda en
+        # stop_reason y en las estadísticas): stop_q corta si algún hijo de la raíz
+        # promedia más que eso (la regla original, "confident"); stop_unreachable si
+        # el hijo más visitado ya no se puede alcanzar con las iteraciones que quedan
+        # ("unreachable", con plazo se estiman al ritmo actual); stop_separation = z
+        # si q - z/sqrt(N) del más visitado supera q + z/sqrt(N) de todos los demás
+        # ("separated", solo con todas las jugadas de la raíz expandidas y visitadas).
+        # Estos dos suponen que se juega el hijo más visitado, así que con cualquiera
+        # de ellos takeAction elige por visitas en vez de por (q, N).
+        # Las combinaciones que una búsqueda no soporta dan ValueError.
+        if node_pool is not None and (solver or rave is not None or tt_size is not None
+                                      or reuse or ponder or workers > 1):
+            raise ValueError("node_pool does not support solver, rave, tt_size, reuse, ponder or workers.")
+        if workers > 1 and (tt_size is not None or reuse or ponder):
+            raise ValueError("workers > 1 does not support tt_size, reuse or ponder.")
+        if rave is not None and rollouts > 1:
+            raise ValueError("rave does not support rollouts > 1.")
         self.T = T 
         self.C = C
+        self.reuse = reuse
+        self.time_ms = time_ms
+        self.max_iterations = max_iterations
+        self.table = self.Table(tt_size, tt_policy) if tt_size is not None else None
+        self.workers = workers
+        self.rollouts = rollouts
+        self.pool_store = self.Pool(node_pool) if node_pool is not None else None
+        self.solver = solver
+        self.book = OpeningBook.open(book) if book is not None and os.path.exists(book) else None
+        self.endgame = endgame
+        self.endgame_ms = endgame_ms
+        self.score_cache = score_cache
+        self.stop_pondering()
+        if stats is not None:
+            self.stats_sink = stats
+        self.profile = profile
+        self.rave = rave
+        self.min_iterations = min_iterations
+        self.stop_q = stop_q
+        self.stop_unreachable = stop_unreachable
+        self.stop_separation = stop_separation
+        self.pondering = ponder
+        self.pondered = False
+        if score_cache is not None:
+            if MCTS.scores is None:
+                MCTS.scores = self.ScoreCache(score_cache)
+            MCTS.scores.size = score_cache
+        self.root = None
+        self.last_action = None
+
+    def reuse_tree(self, state):
+        'Busca en el árbol anterior el nodo de nuestra jugada + la respuesta del rival y lo vuelve raíz'
+
+        previous = self.root
+        self.root = None
+        pondered = self.pondered
+        self.pondered = False
+
+        if not (self.reuse or pondered) or previous is None:
+            return None
+
+        mine = previous.children.get(self.last_action)
+        if mine is None:
+            return None
+
+        key = state.key
+        for child in mine.children.values():
+            if child.state.key == key:
+                child.parent = None   # suelta el resto del árbol viejo
+                return child
 
-    def dynamiC(self, state):
-        total_pieces = 0
+        return None
 
-        for col in state.board:
-            for cell in col:
-                if cell != 0:
-                    total_pieces += 1
+    def dynamiC(self, state):
+        return self.exploration(state.filled.bit_count())
 
+    def exploration(self, total_pieces):
         progress = total_pieces / 42.0
 
         if progress < 0.3: 
@@ -47,6 +336,9 @@ class MCTS(Policy):
 
     def act(self, s: np.ndarray) -> int:
         
+        start = time.monotonic()
+        self.stop_pondering()
+
         player1_count=0
         player2_count=0
 
@@ -66,124 +358,476 @@ class MCTS(Policy):
 
         state = ConnectState(s.copy(), player)
 
+        return self.decide(state, start)
+
+    def act_turn(self, turn) -> int:
+        # Protocolo v2: el torneo entrega el estado vivo, sin recontar fichas ni copiar
+        # el tablero. No se modifica: los nodos solo hacen transition y las
+        # simulaciones trabajan sobre copias.
+        start = time.monotonic()
+        self.stop_pondering()
+        return self.decide(turn.state, start)
+
+    def decide(self, state: ConnectState, start: float) -> int:
+        'Elige la jugada para state (con state.player por jugar); start es cuando empezó el turno'
+
+        player = state.player
+
+        reused = self.reuse_tree(state)
+
+        if self.table is not None:
+            if reused is not None:
+                self.table.prune(state.filled.bit_count())
+            else:
+                # Sin árbol reutilizado la tabla empieza vacía: si no, los nodos nuevos
+                # se enlazarían a subárboles (y N/R) de la jugada anterior
+                self.table.clear()
+
         if state.is_final():
-            self.nodes_explored.append(0)
+            self.record(start, "final")
             return 0
 
+        # Primero el libro de aperturas
+        if self.book is not None:
+            move = self.book.lookup(state)
+            if move is not None and state.is_col_free(move):
+                self.record(start, "book")
+                return move
+
         # traer alturas solo una vez
         free_cols = state.get_free_cols()
         
         if not free_cols:
-            self.nodes_explored.append(0)
+            self.record(start, "final")
             return 0
 
         # Tratar de ganar
-        for cols in free_cols:
-            next_step_copy=state.transition(cols)
-            if next_step_copy.get_winner()==player:
-                self.nodes_explored.append(1)
-                return cols
+        wins = state.winning_moves(player)
+        if wins:
+            self.record(start, "win")
+            return wins[0]
 
         # Bloquear victoria del otro
-        other= -player
-        for cols in free_cols:
-            state_other=ConnectState(state.board, other).transition(cols)
-            
-            if state_other.get_winner()==other:
-                self.nodes_explored.append(1)
-                return cols    
-
-
-        problems= self.problem_two_movements(state, player)
-        
-        actions_score = []
-        for col in free_cols:
-            score = 0.0
-            score += self.center_score(col)
-            score += self.player_strategy(state, col, player)
-            
-            # contar mis amenazas
-            my_threats = 0
-            next_state = state.transition(col)
-            for next_col in next_state.get_free_cols():
-                if next_state.transition(next_col).get_winner() == player:
-                    my_threats += 1
-            score += my_threats
-            
-            # contar amenazas del oponente  
-            opp_threats = 0
-            for next_col in next_state.get_free_cols():
-                if next_state.transition(next_col).get_winner() == -player:
-                    opp_threats += 1
-            score -= opp_threats
-            
-            if col in problems:
-                score -= 2
-                
-            
-            
-            actions_score.append((score, col))
+        blocks = state.blocking_moves(player)
+        if blocks:
+            self.record(start, "block")
+            return blocks[0]
+
+        # Final de partida: jugada perfecta si el solver la prueba a tiempo
+        if self.endgame is not None and state.filled.bit_count() >= self.endgame:
+            if MCTS.endgame_table is None:
+                MCTS.endgame_table = TranspositionTable()
+            # Sin pasarse del plazo de la jugada (time_ms)
+            budget = self.endgame_ms
+            if self.time_ms is not None:
+                budget = min(budget, (start + self.time_ms / 1000 - time.monotonic()) * 1000)
+            solution = solve(state, budget, MCTS.endgame_table) if budget > 0 else None
+            if solution is not None and solution.exact:
+                self.record(start, "endgame", MoveStats(nodes=solution.nodes))
+                return solution.move
+
+        allowed_movements = self.allowed_moves(state, player)
         
-        actions_score.sort(reverse=True)
-
-        if len(actions_score) >= 5:
-            x = 5
+        if reused is not None:
+            # Se conservan las estadísticas de las jugadas permitidas. Las que faltan se
+            # expanden ya: la selección nunca vuelve a expandir un nodo que tiene hijos
+            root = reused
+            for action in [a for a in root.children if a not in allowed_movements]:
+                del root.children[action]
+            for action in allowed_movements:
+                if action not in root.children:
+                    self.add_child(root, action, state.transition(action, validate=False))
+            root.candidates_actions = []
+            # La prueba anterior pudo depender de un hijo que ya no está
+            root.solved = None
+            if self.solver:
+                self.resolve(root)
         else:
-            x = len(actions_score) 
+            root = self.Node(state, None, None)
+            root.candidates_actions= allowed_movements.copy()
+            if self.table is not None:
+                self.table.put(state.key, root)
         
+        if self.time_ms is not None:
+            deadline = start + self.time_ms / 1000
+            limit = self.max_iterations
+        else:
+            deadline = None
+            limit = self.max_iterations if self.max_iterations is not None else self.T
+
+        stats = MoveStats() if self.stats_sink is not None else None
+        if self.pool_store is not None:
+            iterations = self.pool_search(root, player, deadline, limit)
+        elif self.workers > 1:
+            iterations = self.parallel_search(root, player, deadline, limit)
+        else:
+            iterations = self.search(root, player, deadline, limit, stats if self.profile else None)
 
-        allowed_movements = [] 
-
-        i = 0
-        while i < x:
-            actionS = actions_score[i]
-            col = actionS[1]
-            
-            allowed_movements.append(col)
-            i += 1
+        if stats is not None:
+            # Nodos y profundidad del árbol final, se mida o no cada fase
+            if self.pool_store is not None:
+                stats.nodes = int(self.pool_store.used[:self.pool_store.size].sum())
+            else:
+                stats.nodes, stats.max_depth = self.tree_size(root)
+            stats.iterations = iterations
+            self.record(start, self.stop_reason, stats)
 
-        if not allowed_movements:
-            allowed_movements = free_cols.copy()
+        if root.solved == player:
+            # Jugada ganadora probada
+            action = next(a for a, child in root.children.items() if child.solved == player)
         else:
-            # O todas son iguales
-            random.shuffle(allowed_movements)
-        
-        root = self.Node(state, None, None)
-        root.candidates_actions= allowed_movements.copy()
-        
-        for i in range(self.T):
+            action = self.takeAction(root)
+        self.root = root
+        self.last_action = action
+        self.ponder()
+
+        return action
+
+    def ponder(self):
+        'Expande las respuestas del rival a nuestra jugada y las sigue buscando en un hilo'
+
+        if (not self.pondering or self.pool_store is not None or self.workers > 1
+                or self.root is None or self.ponder_thread is not None):
+            return
+
+        mine = self.root.children.get(self.last_action)
+        if mine is None or mine.state.is_final():
+            return
+
+        while mine.candidates_actions:
+            action = mine.candidates_actions.pop()
+            self.add_child(mine, action, mine.state.transition(action, validate=False))
+
+        replies = [child for child in mine.children.values() if not child.state.is_final()]
+        if not replies:
+            return
+
+        # Cada respuesta se busca como la buscaría act: solo con las jugadas permitidas
+        for reply in replies:
+            if not reply.children:
+                reply.candidates_actions = self.allowed_moves(reply.state, reply.state.player)
+
+        self.pondered = True
+        self.ponder_stop = threading.Event()
+        self.ponder_thread = threading.Thread(target=self.ponder_loop, args=(replies, self.ponder_stop), daemon=True)
+        self.ponder_thread.start()
+
+    def ponder_loop(self, replies, stop):
+        # Por turnos, unas pocas iteraciones en cada respuesta (cada una con nosotros por jugar)
+        while not stop.is_set():
+            pending = [reply for reply in replies if reply.solved is None]
+            if not pending:
+                return
+            for reply in pending:
+                if stop.is_set():
+                    return
+                self.search(reply, reply.state.player, None, 16)
+
+    def stop_pondering(self):
+        'Detiene la búsqueda en segundo plano (si hay una) y espera al hilo'
+
+        if self.ponder_thread is not None:
+            self.ponder_stop.set()
+            self.ponder_thread.join()
+            self.ponder_thread = None
+
+    def record(self, start, reason, stats=None):
+        'Completa y entrega las estadísticas de la jugada (nada si no hay sink)'
+
+        if self.stats_sink is None:
+            return
+        if stats is None:
+            stats = MoveStats()
+        stats.elapsed = time.monotonic() - start
+        stats.stop_reason = reason
+        self.stats_sink(stats)
+
+    def tree_size(self, root):
+        'Nodos y profundidad máxima del árbol (con transposiciones cada nodo cuenta una vez)'
+
+        seen = {id(root)}
+        stack = [(root, 0)]
+        max_depth = 0
+        while stack:
+            node, depth = stack.pop()
+            max_depth = max(max_depth, depth)
+            for child in node.children.values():
+                if id(child) not in seen:
+                    seen.add(id(child))
+                    stack.append((child, depth + 1))
+        return len(seen), max_depth
+
+    def search(self, root, player, deadline, limit, stats=None):
+        'Iteraciones de MCTS desde root hasta el plazo o el límite; devuelve cuántas corrieron'
+
+        # Con stats (MoveStats) se mide cada fase; sin stats solo cuesta un "is not None" por fase
+        clock = time.perf_counter
+        iterations = 0
+        self.stop_reason = "limit"
+        started = time.monotonic()
+        for i in (range(limit) if limit is not None else itertools.count()):
+
+            # Siempre al menos una iteración, luego se respeta el plazo
+            if deadline is not None and i > 0 and time.monotonic() >= deadline:
+                self.stop_reason = "deadline"
+                break
 
+            if stats is not None:
+                t0 = clock()
             node = root
+            path = [root]   # con transposiciones un nodo tiene varios padres: se guarda el camino
             
             #Selección
             while( node.state.get_winner() ==0 and node.children != {}): # Hasta que el juego acabe o hayan ramas por explorar
+                if self.solver and all(child.solved is not None for child in node.children.values()):
+                    if not node.candidates_actions:
+                        # Solo en una raíz filtrada: se prueban también las jugadas que quedaron fuera
+                        node.candidates_actions = [a for a in node.state.get_free_cols() if a not in node.children]
+                    break   # solo quedan hijos resueltos: se expande otra jugada
                 node = self.select_ucb(node)
+                path.append(node)
+            if stats is not None:
+                t1 = clock()
             
             #Expansión
             if (node.state.get_winner() == 0 and node.candidates_actions != []):
                 node = self.expand(node)
+                path.append(node)
+            if stats is not None:
+                t2 = clock()
             
             #Simulación
-            R = self.innerTrial(node.state, player)
+            if self.rollouts > 1:
+                batch = self.batch_playout(node.state)
+                R = float(np.mean(batch.winner * player))
+                if stats is not None:
+                    stats.rollout_plies += int(batch.heights.sum()) - node.state.filled.bit_count() * self.rollouts
+            else:
+                final = self.rave_simulate(path, player) if self.rave is not None else self.playout(node.state)
+                R = self.reward(final.winner, player)
+                if stats is not None:
+                    stats.rollout_plies += final.filled.bit_count() - node.state.filled.bit_count()
+            if stats is not None:
+                t3 = clock()
             
             #Backpropagation
-            self.propagation(node, R)
+            self.propagation(path, R)
+            iterations = i + 1
 
-            if i > 10:
-                mejor_q = -1
+            if self.solver:
+                self.update_solved(path)
 
-                for action, child in root.children.items():
-                    if child.N > 0:
-                        q = child.R / child.N
-                        if q > mejor_q:
-                            mejor_q = q
+            if stats is not None:
+                t4 = clock()
+                stats.select_time += t1 - t0
+                stats.expand_time += t2 - t1
+                stats.simulate_time += t3 - t2
+                stats.backprop_time += t4 - t3
 
-                if mejor_q > 0.7:
+            if self.solver and root.solved is not None:
+                self.stop_reason = "solved"
+                break
+
+            if iterations >= self.min_iterations:
+                # Sin los hijos con derrota probada, que takeAction tampoco juega
+                children = [c for c in root.children.values() if c.solved != -player] or root.children.values()
+                reason = self.early_stop([(c.N, c.R) for c in children],
+                                         bool(root.candidates_actions), iterations, limit, deadline, started)
+                if reason is not None:
+                    self.stop_reason = reason
                     break
 
-        self.nodes_explored.append(root.N)
+        return iterations
+
+    def early_stop(self, children, pending, iterations, limit, deadline, started):
+        'Motivo para cortar la búsqueda ya, o None; children son los (N, R) de los hijos de la raíz'
+
+        visited = sorted(((N, R / N) for N, R in children if N > 0), reverse=True)
+        if not visited:
+            return None
+
+        # Regla de siempre: algún hijo ya tiene un promedio muy alto
+        if self.stop_q is not None and max(q for _, q in visited) > self.stop_q:
+            return "confident"
+
+        best_N, best_q = visited[0]
+        second_N = visited[1][0] if len(visited) > 1 else 0
+
+        # El más visitado ya no se puede alcanzar con las iteraciones que quedan
+        if self.stop_unreachable:
+            remaining = None if limit is None else limit - iterations
+            if deadline is not None:
+                now = time.monotonic()
+                # Al ritmo que lleva la búsqueda
+                by_time = (deadline - now) * iterations / max(now - started, 1e-9)
+                remaining = by_time if remaining is None else min(remaining, by_time)
+            if remaining is not None and best_N - second_N > remaining:
+                return "unreachable"
+
+        # Intervalos de confianza separados: el peor caso del más visitado le gana al
+        # mejor caso de cada otro hijo (recompensas en [-1, 1], desviación <= 1)
+        if (self.stop_separation is not None and not pending
+                and len(visited) > 1 and len(visited) == len(children)):
+            z = self.stop_separation
+            lower = best_q - z / math.sqrt(best_N)
+            if all(lower > q + z / math.sqrt(N) for N, q in visited[1:]):
+                return "separated"
+
+        return None
+
+    def pool_search(self, root, player, deadline, limit):
+        'Mismo MCTS que search pero sobre el Pool; al final los hijos de la raíz pasan a root'
+
+        pool = self.pool_store
+        pool.reset()
+        pool.allocate(1)
+        order = list(root.candidates_actions)   # orden (barajado) de la raíz para expand
+        pool.store(0, root.state, -1, -1, sum(1 << a for a in order))
+
+        iterations = 0
+        self.stop_reason = "limit"
+        started = time.monotonic()
+        for i in (range(limit) if limit is not None else itertools.count()):
+
+            if deadline is not None and i > 0 and time.monotonic() >= deadline:
+                self.stop_reason = "deadline"
+                break
 
-        return self.takeAction(root)
+            node = 0
+            path = [0]
+
+            #Selección
+            while pool.winner[node] == 0 and pool.children[node] >= 0:
+                node = self.pool_select(node)
+                path.append(node)
+
+            #Expansión
+            state = pool.state(node)
+            if pool.winner[node] == 0 and pool.candidates[node]:
+                node, state = self.pool_expand(node, state, order if node == 0 else None)
+                path.append(node)
+
+            #Simulación
+            R = self.simulate(state, player)
+
+            #Backpropagation: la hoja recibe R, su padre -R, y así
+            path = np.array(path)
+            signs = np.where((len(path) - 1 - np.arange(len(path))) % 2 == 0, 1.0, -1.0)
+            pool.N[path] += 1
+            pool.R[path] += R * signs
+            iterations = i + 1
+
+            if iterations >= self.min_iterations:
+                block = pool.children[0]
+                if block >= 0:
+                    used = np.flatnonzero(pool.used[block:block + ConnectState.COLS]) + block
+                    reason = self.early_stop(list(zip(pool.N[used].tolist(), pool.R[used].tolist())),
+                                             bool(pool.candidates[0]), iterations, limit, deadline, started)
+                    if reason is not None:
+                        self.stop_reason = reason
+                        break
+
+        # Hijos de la raíz como Node para takeAction y las métricas
+        root.N += int(pool.N[0])
+        root.R += float(pool.R[0])
+        block = pool.children[0]
+        if block >= 0:
+            for action in np.flatnonzero(pool.used[block:block + ConnectState.COLS]):
+                action = int(action)
+                child = self.Node(root.state.transition(action, validate=False), root, action)
+                child.N = int(pool.N[block + action])
+                child.R = float(pool.R[block + action])
+                root.children[action] = child
+        root.candidates_actions = [a for a in order if a not in root.children]
+
+        return iterations
+
+    def pool_select(self, node):
+        'UCB de todos los hijos de node en una sola expresión vectorizada'
+
+        pool = self.pool_store
+        block = pool.children[node]
+        used = pool.used[block:block + ConnectState.COLS]
+        N = pool.N[block:block + ConnectState.COLS]
+
+        unvisited = np.flatnonzero(used & (N == 0))
+        if unvisited.size:
+            return block + int(random.choice(unvisited))
+
+        pieces = (int(pool.red[node]) | int(pool.yellow[node])).bit_count()
+        Q = pool.R[block:block + ConnectState.COLS] / np.maximum(N, 1)
+        ucb = Q + self.exploration(pieces) * np.sqrt(math.log(pool.N[node] + 1) / (N + 1))
+        ucb[~used] = -np.inf
+        return block + int(np.argmax(ucb))
+
+    def pool_expand(self, node, state, order):
+        'Como expand: primero ganar, luego bloquear, si no la siguiente jugada pendiente'
+
+        pool = self.pool_store
+        candidates = int(pool.candidates[node])
+
+        wins = [a for a in state.winning_moves() if candidates >> a & 1]
+        blocks = [a for a in state.blocking_moves() if candidates >> a & 1]
+        if wins:
+            action = random.choice(wins)
+        elif blocks:
+            action = random.choice(blocks)
+        elif order is not None:
+            action = [a for a in order if candidates >> a & 1][-1]
+        else:
+            action = candidates.bit_length() - 1   # como pop() sobre las columnas en orden
+
+        pool.candidates[node] = candidates & ~(1 << action)
+        if order is not None:
+            order.remove(action)
+
+        if pool.children[node] < 0:
+            pool.children[node] = pool.allocate(ConnectState.COLS)
+        child = int(pool.children[node]) + action
+
+        next_state = state.transition(action, validate=False)
+        pool.store(child, next_state, node, action, next_state.legal)
+        return child, next_state
+
+    @classmethod
+    def pool(cls, workers):
+        if workers not in cls.pools:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            atexit.register(pool.shutdown, cancel_futures=True)
+            cls.pools[workers] = pool
+        return cls.pools[workers]
+
+    def parallel_search(self, root, player, deadline, limit):
+        'Búsqueda en paralelo desde la raíz, cada worker empezando por otra jugada: junta N/R de los hijos de la raíz'
+
+        time_left = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+        tasks = [
+            (root.state, player, root.candidates_actions, index, self.C, self.rollouts, self.rave, self.solver,
+             (self.min_iterations, self.stop_q, self.stop_unreachable, self.stop_separation),
+             limit, time_left, random.getrandbits(32))
+            for index in range(self.workers)
+        ]
+
+        iterations = 0
+        reasons = set()
+        for stats, worker_iterations, worker_N, reason in self.pool(self.workers).map(_root_search, tasks):
+            iterations += worker_iterations
+            reasons.add(reason)
+            root.N += worker_N
+            for action, (N, R, solved) in stats.items():
+                child = root.children.get(action)
+                if child is None:
+                    child = self.add_child(root, action, root.state.transition(action, validate=False))
+                child.N += N
+                child.R += R
+                if self.solver and solved is not None:
+                    child.solved = solved
+
+        root.candidates_actions = [a for a in root.candidates_actions if a not in root.children]
+        if self.solver:
+            self.resolve(root)
+        self.stop_reason = ",".join(sorted(reasons))   # uno por cada motivo con el que paró algún worker
+        return iterations
             
 
     
@@ -191,6 +835,8 @@ class MCTS(Policy):
         # Primero seleccionar todos los no visitados para que sirva el UCB
         unvisited = []
         for action, child in node.children.items():    
+            if self.solver and child.solved is not None:
+                continue   # subárbol resuelto: no hace falta explorarlo más
             if child.N == 0:
                 unvisited.append(child)
         
@@ -204,10 +850,17 @@ class MCTS(Policy):
         
         for action, child in node.children.items():
             
+            if self.solver and child.solved is not None:
+                continue
+
             if child.N > 0:
                 Q = child.R/child.N
             else:
                 Q = 0
+
+            if self.rave is not None and node.AN is not None and node.AN[action] > 0:
+                beta = math.sqrt(self.rave / (3 * child.N + self.rave))
+                Q = (1 - beta) * Q + beta * node.AR[action] / node.AN[action]
             
             exploration_factor =  dynamic_C * math.sqrt( math.log(node.N + 1) / (child.N + 1) )   
             
@@ -225,100 +878,172 @@ class MCTS(Policy):
         legal_action= node.candidates_actions.copy()
         reorder_actions=random.sample(legal_action, k=len(legal_action))
 
+        wins = node.state.winning_moves()
         for action in reorder_actions:
-            next_state = node.state.transition(action)
 
-            if next_state.get_winner()== node.state.player:
+            if action in wins:
+                next_state = node.state.transition(action, validate=False)
                 node.candidates_actions.remove(action)
-                child = self.Node(next_state, node, action)
-                child.candidates_actions = list(child.state.get_free_cols())
-                node.children[action] = child
+                return self.add_child(node, action, next_state)
             
-                return child
-            
-        other_player= -node.state.player
-
+        blocks = node.state.blocking_moves()
         for action in reorder_actions:
-            next_state_other= ConnectState(node.state.board.copy(),other_player).transition(action)
 
-            if next_state_other.get_winner()==other_player:
+            if action in blocks:
 
                 node.candidates_actions.remove(action)
-                no_play_state=node.state.transition(action)
-                child=self.Node(no_play_state,node,action)
-                child.candidates_actions=no_play_state.get_free_cols()
-                node.children[action] =child
-
-                return child
+                no_play_state=node.state.transition(action, validate=False)
+                return self.add_child(node, action, no_play_state)
 
         if node.candidates_actions:
-            action=node.candidates_actions.pop()
-            next_statee=node.state.transition(action )
-            child= self.Node(next_statee,node,action)
-            child.candidates_actions = list(child.state.get_free_cols())
-            node.children[action]=child
-
-            return child
+            if self.rave is not None and node.AN is not None:
+                # Con RAVE la de mejor promedio AMAF (sin datos cuenta 0; en empate la última, como pop)
+                action = max(reversed(node.candidates_actions),
+                             key=lambda a: node.AR[a] / node.AN[a] if node.AN[a] else 0)
+                node.candidates_actions.remove(action)
+            else:
+                action=node.candidates_actions.pop()
+            next_statee=node.state.transition(action, validate=False)
+            return self.add_child(node, action, next_statee)
+
+    def add_child(self, node, action, state):
+        # Si la posición ya está en la tabla se enlaza ese nodo (y sus estadísticas)
+        child = None
+        if self.table is not None:
+            child = self.table.get(state.key)
+        if child is None:
+            child = self.Node(state, node, action)
+            if self.table is not None:
+                self.table.put(state.key, child)
+        node.children[action] = child
+        return child
     
+    def simulate(self, state: ConnectState, player: int):
+        if self.rollouts > 1:
+            return self.batchTrial(state, player)
+        return self.innerTrial(state, player)
+
+    def batchTrial(self, state: ConnectState, player: int):
+        
+        'Igual que innerTrial (ganar, si no bloquear, si no aleatorio) pero con rollouts partidas a la vez'
+
+        winners = self.batch_playout(state).winner
+
+        # 1 si gana player, -1 si gana el otro, 0 empate; se promedia
+        return float(np.mean(winners * player))
+
+    def batch_playout(self, state: ConnectState):
+        batch = BatchConnectState.from_states([state] * self.rollouts)
+        batch.play_out(self.rng, heuristic=True)
+        return batch
+
     def innerTrial(self, state: ConnectState, player:int):
         
         'Primero intenta ganar, si no puede entonces bloquea al oponente. Si no hay riesgo claro juega aleatorio'
 
+        return self.reward(self.playout(state).winner, player)
+
+    def reward(self, winner, player):
+        if winner == 0:
+            return 0
+        return 1 if winner == player else -1
+
+    def playout(self, state: ConnectState):
+        'Juega una copia de state hasta el final y la devuelve'
+
+        # Se juega sobre una copia con play para no crear un estado por jugada
+        state = state.copy()
+
         while True:
-            
-            winner = state.get_winner()
 
-            if winner !=0:
-                if winner == player:
-                    return 1
-                else:
-                    return -1
-            
+            if state.get_winner() != 0:
+                return state
 
             play=None
 
 
-            free_cols = list(state.get_free_cols())
+            free_cols = state.get_free_cols()
             
             if not free_cols:
-                return 0
+                return state
             
             # intentar ganar
-            for action in free_cols:
-                    
-                    next_step_copy=state.transition(action)
-
-                    if next_step_copy.get_winner()== state.player:
-                        play=action
-                        break
+            wins = state.winning_moves()
+            if wins:
+                play = wins[0]
             
             # bloquear si es necesario
             if play is None:
-                other=-state.player
-
-                for act in free_cols:
-
-                    other_player_state= ConnectState(state.board,other)
-                    next_other_player_state = other_player_state.transition(act)
-
-                    if next_other_player_state.get_winner()==other:
-                        play = act
-                        break
+                blocks = state.blocking_moves()
+                if blocks:
+                    play = blocks[0]
                 
             if play is None:
                 play = random.choice(free_cols)
             
             
-            state = state.transition(play)
+            state.play(play)
         
     
-    def propagation(self, node, R: float):
+    def rave_simulate(self, path, player: int):
+        'Simulación desde la hoja de path que además actualiza las estadísticas AMAF; devuelve el estado final'
+
+        final = self.playout(path[-1].state)
+        R = self.reward(final.winner, player)
+
+        # Columnas que jugó cada lado desde cada nodo del camino hasta el final,
+        # empezando por la simulación (play deja cada jugada en final.moves)
+        played = {-1: set(), 1: set()}
+        for col, mover, _, _ in final.moves or ():
+            played[mover].add(col)
+
+        # Desde la hoja hacia arriba, cada nodo suma a cada columna que jugó quien mueve
+        # en él (expandida o no) el valor que propagation le daría al hijo de esa columna
+        value = -R
+        for k in range(len(path) - 1, -1, -1):
+            node = path[k]
+            mover = node.state.player
+            if k + 1 < len(path):
+                # Con transposiciones child.action puede venir de otro padre: se usa la arista
+                played[mover].add(next(a for a, c in node.children.items() if c is path[k + 1]))
+            if node.AN is None:
+                node.AN = [0] * ConnectState.COLS
+                node.AR = [0.0] * ConnectState.COLS
+            for action in played[mover]:
+                node.AN[action] += 1
+                node.AR[action] += value
+            value = -value
+
+        return final
+
+    def propagation(self, path, R: float):
         
-        while node is not None:
+        for node in reversed(path):
             node.N += 1
             node.R += R
             R = -R # Porque es de juego de suma cero
-            node = node.parent
+
+    def update_solved(self, path):
+        'Sube los valores probados por el camino mientras algún nodo quede resuelto'
+
+        for node in reversed(path[:-1]):   # la hoja ya se marcó al crearse
+            if node.solved is None and not self.resolve(node):
+                break
+
+    def resolve(self, node):
+        'Minimax: gana si algún hijo gana para quien mueve; si todos están resueltos, el mejor de ellos'
+
+        mover = node.state.player
+        values = [child.solved for child in node.children.values()]
+
+        if mover in values:
+            node.solved = mover
+        elif len(values) == node.state.legal.bit_count() and None not in values:
+            # Sin una jugada ganadora solo hay prueba si se resolvieron todas las legales,
+            # no solo las permitidas de la raíz
+            node.solved = 0 if 0 in values else -mover
+
+        return node.solved is not None
     
     
     def takeAction(self, node):
@@ -330,8 +1055,12 @@ class MCTS(Policy):
         if not node.state.get_free_cols():
             return 0
 
+        # Evitar hijos con derrota probada mientras haya otra opción
+        losing = [a for a, child in node.children.items() if child.solved == -node.state.player]
+        avoid = losing if len(losing) < len(node.children) else []
+
         for action, child in node.children.items():
-            if action not in node.state.get_free_cols():
+            if action not in node.state.get_free_cols() or action in avoid:
                 continue
 
             if child.N > 0:
@@ -339,8 +1068,12 @@ class MCTS(Policy):
             else:
                 q=0
 
-            q_ajus = max(q, 0.0)
-            score = (q_ajus + eps) * (child.N + 1)
+            if self.stop_unreachable or self.stop_separation is not None:
+                # Como suponen esas paradas: el más visitado (q solo desempata)
+                score = child.N + (q + 1) / 3
+            else:
+                q_ajus = max(q, 0.0)
+                score = (q_ajus + eps) * (child.N + 1)
 
             if score > best_q_value:
                 if action in node.state.get_free_cols():
@@ -353,7 +1086,7 @@ class MCTS(Policy):
                 
                 for action, child in node.children.items():
 
-                    if action not in node.state.get_free_cols():
+                    if action not in node.state.get_free_cols() or action in avoid:
                         continue
                     if child.N < visits:
                         visits=child.N
@@ -365,6 +1098,73 @@ class MCTS(Policy):
 
         return best_action
     
+    def allowed_moves(self, state: ConnectState, player: int):
+        'Las (hasta) 5 columnas con mejor puntaje heurístico, en orden aleatorio'
+
+        actions_score = self.root_scores(state, player)
+        
+        actions_score.sort(reverse=True)
+
+        if len(actions_score) >= 5:
+            x = 5
+        else:
+            x = len(actions_score) 
+        
+
+        allowed_movements = [] 
+
+        i = 0
+        while i < x:
+            actionS = actions_score[i]
+            col = actionS[1]
+            
+            allowed_movements.append(col)
+            i += 1
+
+        if not allowed_movements:
+            allowed_movements = state.get_free_cols()
+        else:
+            # O todas son iguales
+            random.shuffle(allowed_movements)
+
+        return allowed_movements
+
+    def root_scores(self, state: ConnectState, player: int):
+        'Puntaje heurístico de cada columna libre de la raíz, guardado en la caché compartida'
+
+        cache = MCTS.scores if self.score_cache is not None else None
+        if cache is not None:
+            scores = cache.get(state.key)
+            if scores is not None:
+                return list(scores)
+
+        problems= self.problem_two_movements(state, player)
+        
+        actions_score = []
+        for col in state.get_free_cols():
+            score = 0.0
+            score += self.center_score(col)
+            score += self.player_strategy(state, col, player)
+            
+            # Mis amenazas no suman: el conteo original ponía fichas del rival y
+            # siempre daba 0, y contarlas de verdad no mejoró el juego
+            next_state = state.transition(col, validate=False)
+            
+            # contar amenazas del oponente  
+            opp_threats = len(next_state.winning_moves(-player))
+            score -= opp_threats
+            
+            if col in problems:
+                score -= 2
+                
+            
+            
+            actions_score.append((score, col))
+
+        if cache is not None:
+            cache.put(state.key, tuple(actions_score))
+        return actions_score
+
     def problem_two_movements(self, state: ConnectState, player:int):
 
         other_player=-player
@@ -373,20 +1173,11 @@ class MCTS(Policy):
         free_cols = state.get_free_cols()
         for col in free_cols:
 
-            new_state = state.transition(col)
-
-            problems_count=0
+            new_state = state.transition(col, validate=False)
 
-            for one in new_state.get_free_cols():
-                other_state=new_state.transition(one)
-
-                if other_state.get_winner() == other_player:
-
-                    problems_count= problems_count+1
-                
-                if problems_count >=2:
-                    future_problems.append(col)
-                    break
+            # jugadas que le dejan al otro dos victorias inmediatas
+            if len(new_state.winning_moves(other_player)) >= 2:
+                future_problems.append(col)
 
         return future_problems
 
@@ -400,10 +1191,8 @@ class MCTS(Policy):
     def player_strategy(self, state, col, player):
         
         h = 0
-        for row in range(state.ROWS):
-            if state.board[(state.ROWS -1) - row, col] == 0:
-                h = row+1
-                break
+        if state.is_col_free(col):
+            h = state.heights[col] + 1
         
         if h == 0:
             return -1
@@ -419,4 +1208,35 @@ class MCTS(Policy):
         if h % 2 == 0:
             return 1
         
-        return 0
\ No newline at end of file
+        return 0
+
+
+def _root_search(task):
+    'Trabajo de cada proceso en la búsqueda paralela: un MCTS desde la raíz que empieza por la jugada index'
+
+    state, player, candidates, index, C, rollouts, rave, solver, stop, limit, time_left, seed = task
+    random.seed(seed)
+
+    # expand abre la última candidata y la selección no expande otra en un nodo con
+    # hijos: la jugada index va al final para que cada worker pruebe una distinta
+    candidates = list(candidates)
+    if candidates:
+        first = candidates.pop(index % len(candidates))
+        random.shuffle(candidates)
+        candidates.append(first)
+
+    policy = MCTS()
+    policy.C = C
+    policy.rollouts = rollouts
+    policy.rave = rave
+    policy.solver = solver
+    policy.min_iterations, policy.stop_q, policy.stop_unreachable, policy.stop_separation = stop
+    policy.rng = np.random.default_rng(seed)
+    root = policy.Node(state, None, None)
+    root.candidates_actions = candidates
+
+    deadline = None if time_left is None else time.monotonic() + time_left
+    iterations = policy.search(root, player, deadline, limit)
+
+    stats = {action: (child.N, child.R, child.solved) for action, child in root.children.items()}
+    return stats, iterations, root.N, policy.stop_reason
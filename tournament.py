@@ -1,6 +1,8 @@
+import time
 from typing import Callable
 from connect4.dtos import Game, Match, Participant, Versus
 from connect4.connect_state import ConnectState
+from connect4.policy import Turn, uses_turns
 import numpy as np
 
 
@@ -53,8 +55,21 @@ def play(
     best_of: int,
     first_player_distribution: float,
     seed: int = 911,
+    ponder: bool = False,
+    clock: float | None = None,
 ) -> Participant:
-    """Play a match between two participants and return the winner."""
+    """
+    Play a match between two participants and return the winner.
+
+    Unless ``ponder`` is True, each policy's background search (if any) is
+    stopped as soon as it returns a move, so it never runs during the
+    opponent's turn and both sides are timed on their own moves only.
+
+    Policies that implement ``act_turn`` (protocol v2) get a ``Turn`` with the
+    live state; the rest get ``act(state.board)``. With ``clock`` (seconds per
+    player and game) the time each side has left is tracked and reported in
+    the ``Turn``; it is informative only and never ends a game.
+    """
     # Variables
     a_name, a_policy = a
     b_name, b_policy = b
@@ -85,13 +100,28 @@ def play(
 
         state = ConnectState()
         game_history: Game = Game()
+        turns = {-1: uses_turns(first_policy), 1: uses_turns(second_policy)}
+        time_left = {-1: clock, 1: clock}
+        last_move = None
 
         while not state.is_final():
             current_policy = first_policy if state.player == -1 else second_policy
-            action = current_policy.act(state.board)
+            started = time.monotonic()
+            if turns[state.player]:
+                turn = Turn(state, state.player, last_move, time_left[state.player])
+                action = current_policy.act_turn(turn)
+            else:
+                action = current_policy.act(state.board)
+            if clock is not None:
+                time_left[state.player] -= time.monotonic() - started
+            last_move = int(action)
+            if not ponder:
+                current_policy.stop_pondering()
             game_history.append((state.board.copy().tolist(), int(action)))
             state = state.transition(int(action))
 
+        first_policy.stop_pondering()
+        second_policy.stop_pondering()
         games.append(game_history)
 
         # Determine winner